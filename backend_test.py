@@ -4,16 +4,81 @@ Comprehensive Backend API Testing for Blossom App
 Tests all backend endpoints with proper authentication and data validation
 """
 
+import orjson
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import argparse
+import array
+import functools
+import os
+import statistics
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import base64
+from pathlib import Path
 
 # Configuration
 BASE_URL = "https://moms-journey.preview.emergentagent.com/api"
 TEST_USER_EMAIL = "sarah@example.com"
 TEST_USER_PASSWORD = "test1234"
+MAX_PARALLEL_TESTS = 8
+LATENCY_SAMPLES = 5
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_STATUSES = (429, 502, 503, 504)
+TIER_BANNER = "\n" + "="*50 + "\n{tier} PRIORITY TESTS\n" + "="*50 + "\n"
+
+# Opt-in reuse of the login token across local re-runs; off by default so CI
+# always exercises the real login
+USE_SESSION_CACHE = os.environ.get("BLOSSOM_TEST_CACHE") == "1"
+SESSION_CACHE_PATH = Path.home() / ".cache" / "blossom_tests" / "session.json"
+SESSION_CACHE_TTL_SECONDS = 3600
+
+# Endpoints
+URL_REGISTER = f"{BASE_URL}/auth/register"
+URL_LOGIN = f"{BASE_URL}/auth/login"
+URL_SESSION_DATA = f"{BASE_URL}/auth/session-data"
+URL_ME = f"{BASE_URL}/auth/me"
+URL_LOGOUT = f"{BASE_URL}/auth/logout"
+URL_POSTS = f"{BASE_URL}/posts"
+URL_POSTS_PREGNANCY = f"{BASE_URL}/posts?category=pregnancy"
+URL_COMMENTS = f"{BASE_URL}/comments"
+URL_FORUMS = f"{BASE_URL}/forums"
+URL_SUPPORT_GROUPS = f"{BASE_URL}/support-groups"
+URL_MILESTONES = f"{BASE_URL}/milestones"
+URL_RESOURCES = f"{BASE_URL}/resources"
+URL_RESOURCES_PREGNANCY = f"{BASE_URL}/resources?category=pregnancy"
+URL_PREMIUM_STATUS = f"{BASE_URL}/premium/status"
+URL_PREMIUM_SUBSCRIBE = f"{BASE_URL}/premium/subscribe"
+URL_REGISTER_PUSH_TOKEN = f"{BASE_URL}/notifications/register-token"
+URL_NOTIFICATION_PREFERENCES = f"{BASE_URL}/notifications/preferences"
+URL_SEED_DATA = f"{BASE_URL}/seed-data"
+
+# Fields each response shape must carry
+REQUIRED_FIELDS = {
+    "auth": ("access_token", "user"),
+    "user": ("user_id", "email"),
+    "message": ("message",),
+    "post": ("post_id", "moderation_status"),
+    "like": ("liked",),
+    "comment": ("comment_id", "post_id"),
+    "forum": ("forum_id",),
+    "milestone": ("milestone_id",),
+    "premium": ("is_premium",),
+    "preferences": ("user_id",)
+}
+
+# Idempotent reads sampled repeatedly to separate slow endpoints from one-off timeouts
+LATENCY_ENDPOINTS = (
+    ("Current User", URL_ME),
+    ("Posts Feed", URL_POSTS),
+    ("Forums", URL_FORUMS),
+    ("Resources", URL_RESOURCES),
+    ("Premium Status", URL_PREMIUM_STATUS)
+)
 
 # Test data
 TEST_POST_DATA = {
@@ -41,38 +106,114 @@ TEST_PUSH_TOKEN_DATA = {
     "platform": "ios"
 }
 
+TEST_REGISTER_DATA = {
+    "password": "testpass123",
+    "name": "Test User Registration"
+}
+
+TEST_PREFERENCES_DATA = {"new_posts": False, "milestone_reminders": True}
+
+# The payloads never change, so serialize them once
+JSON_HEADERS = {"Content-Type": "application/json"}
+TEST_LOGIN_JSON = orjson.dumps({"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD})
+TEST_POST_JSON = orjson.dumps(TEST_POST_DATA)
+TEST_MILESTONE_JSON = orjson.dumps(TEST_MILESTONE_DATA)
+TEST_PUSH_TOKEN_JSON = orjson.dumps(TEST_PUSH_TOKEN_DATA)
+TEST_PREFERENCES_JSON = orjson.dumps(TEST_PREFERENCES_DATA)
+# Registration body after the opening brace; the unique email is spliced in front
+TEST_REGISTER_SUFFIX = orjson.dumps(TEST_REGISTER_DATA)[1:]
+# Comment body up to the opening quote of post_id, which is filled in per test
+TEST_COMMENT_PREFIX = orjson.dumps(TEST_COMMENT_DATA)[:-1] + b',"post_id":"'
+
+def api_test(name, critical=False):
+    """Log any exception from a test as a failure and record its duration"""
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(self):
+            start = time.perf_counter_ns()
+            try:
+                test(self)
+            except Exception as e:
+                self.log_result(name, False, f"Exception: {str(e)}", critical)
+            finally:
+                self.timings[name] = time.perf_counter_ns() - start
+        return wrapper
+    return decorator
+
 class BlossomAPITester:
-    def __init__(self):
+    def __init__(self, fail_fast=False):
+        self.fail_fast = fail_fast
         self.session = requests.Session()
+        # Keep enough warm connections for the parallel tests and retry
+        # rate limits and transient gateway errors on idempotent requests
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=RETRY_ATTEMPTS,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(["GET", "PUT"]),
+                respect_retry_after_header=True
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "BlossomTester/1.0", "Accept": "application/json"})
         self.auth_token = None
         self.session_token = None
         self.test_user_id = None
         self.test_post_id = None
+        self.test_post_url = None
         self.test_milestone_id = None
-        self.results = {
-            "passed": [],
-            "failed": [],
-            "critical_failures": []
-        }
+        # Results are kept column-wise; details are only stored for failures
+        self.test_names = []
+        self.success = bytearray()
+        self.details = {}
+        self.critical_failures = []
+        self.passed_count = 0
+        self.failed_count = 0
+        self.results_lock = threading.Lock()
+        self.latencies = {}
+        self.timings = {}
+
+    @staticmethod
+    def parse_json(response):
+        """Decode a JSON response body with orjson"""
+        return orjson.loads(response.content)
+
+    @staticmethod
+    def has_fields(data, shape):
+        """Check that a decoded response carries the fields its shape requires"""
+        return all(field in data for field in REQUIRED_FIELDS[shape])
+
+    @staticmethod
+    def body_snippet(response, limit=512):
+        """Return the start of a response body for failure messages"""
+        return response.content[:limit].decode("utf-8", "replace")
 
     def log_result(self, test_name, success, details="", is_critical=False):
         """Log test results"""
-        result = {
-            "test": test_name,
-            "success": success,
-            "details": details,
-            "timestamp": datetime.now().isoformat()
-        }
+        with self.results_lock:
+            idx = len(self.test_names)
+            self.test_names.append(test_name)
+            self.success.append(1 if success else 0)
+            if success:
+                self.passed_count += 1
+            else:
+                self.failed_count += 1
+                self.details[idx] = details
+                if is_critical:
+                    self.critical_failures.append(idx)
         
         if success:
-            self.results["passed"].append(result)
             print(f"✅ {test_name}")
         else:
-            self.results["failed"].append(result)
-            if is_critical:
-                self.results["critical_failures"].append(result)
             print(f"❌ {test_name}: {details}")
+            if self.fail_fast:
+                raise SystemExit(1)
 
+    @api_test("User Registration (JWT)", critical=True)
     def test_user_registration(self):
         """Test JWT user registration"""
         print("\n=== Testing User Registration (JWT) ===")
@@ -80,54 +221,41 @@ class BlossomAPITester:
         # Use a unique email for registration test
         test_email = f"test_user_{datetime.now().strftime('%Y%m%d_%H%M%S')}@example.com"
         
-        data = {
-            "email": test_email,
-            "password": "testpass123",
-            "name": "Test User Registration"
-        }
+        register_json = b'{"email":"' + test_email.encode() + b'",' + TEST_REGISTER_SUFFIX
         
-        try:
-            response = self.session.post(f"{BASE_URL}/auth/register", json=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "access_token" in result and "user" in result:
-                    self.log_result("User Registration (JWT)", True, "Registration successful with token")
-                else:
-                    self.log_result("User Registration (JWT)", False, "Missing token or user in response", True)
+        response = self.session.post(URL_REGISTER, data=register_json, headers=JSON_HEADERS)
+        
+        if response.status_code == 200:
+            result = self.parse_json(response)
+            if self.has_fields(result, "auth"):
+                self.log_result("User Registration (JWT)", True, "Registration successful with token")
             else:
-                self.log_result("User Registration (JWT)", False, f"Status: {response.status_code}, Response: {response.text}", True)
-                
-        except Exception as e:
-            self.log_result("User Registration (JWT)", False, f"Exception: {str(e)}", True)
+                self.log_result("User Registration (JWT)", False, "Missing token or user in response", True)
+        else:
+            self.log_result("User Registration (JWT)", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}", True)
 
+    @api_test("User Login (JWT)", critical=True)
     def test_user_login(self):
         """Test JWT user login"""
         print("\n=== Testing User Login (JWT) ===")
         
-        data = {
-            "email": TEST_USER_EMAIL,
-            "password": TEST_USER_PASSWORD
-        }
-        
-        try:
-            response = self.session.post(f"{BASE_URL}/auth/login", json=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "access_token" in result and "user" in result:
-                    self.auth_token = result["access_token"]
-                    self.test_user_id = result["user"]["user_id"]
-                    self.session.headers.update({"Authorization": f"Bearer {self.auth_token}"})
-                    self.log_result("User Login (JWT)", True, "Login successful with token")
-                else:
-                    self.log_result("User Login (JWT)", False, "Missing token or user in response", True)
+        response = self.session.post(URL_LOGIN, data=TEST_LOGIN_JSON, headers=JSON_HEADERS)
+        
+        if response.status_code == 200:
+            result = self.parse_json(response)
+            if self.has_fields(result, "auth"):
+                self.auth_token = result["access_token"]
+                self.test_user_id = result["user"]["user_id"]
+                # Set once on the session, already encoded for the wire
+                self.session.headers["Authorization"] = f"Bearer {self.auth_token}".encode("latin-1")
+                self.log_result("User Login (JWT)", True, "Login successful with token")
+                self.save_cached_session()
             else:
-                self.log_result("User Login (JWT)", False, f"Status: {response.status_code}, Response: {response.text}", True)
-                
-        except Exception as e:
-            self.log_result("User Login (JWT)", False, f"Exception: {str(e)}", True)
+                self.log_result("User Login (JWT)", False, "Missing token or user in response", True)
+        else:
+            self.log_result("User Login (JWT)", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}", True)
 
+    @api_test("Google OAuth Integration", critical=True)
     def test_google_oauth_session(self):
         """Test Google OAuth session exchange"""
         print("\n=== Testing Google OAuth Integration ===")
@@ -136,27 +264,24 @@ class BlossomAPITester:
         # In real scenario, we'd need a valid session ID from Emergent Auth
         test_session_id = "test_session_12345"
         
-        try:
-            headers = {"X-Session-ID": test_session_id}
-            response = self.session.get(f"{BASE_URL}/auth/session-data", headers=headers)
-            
-            # We expect this to fail with 401 since we don't have a real session ID
-            # But we're testing that the endpoint exists and handles the request properly
-            if response.status_code == 401:
-                self.log_result("Google OAuth Integration", True, "Endpoint exists and properly validates session ID")
-            elif response.status_code == 400:
-                # Test without header
-                response2 = self.session.get(f"{BASE_URL}/auth/session-data")
-                if response2.status_code == 400:
-                    self.log_result("Google OAuth Integration", True, "Endpoint properly requires X-Session-ID header")
-                else:
-                    self.log_result("Google OAuth Integration", False, "Endpoint doesn't properly validate missing header")
+        headers = {"X-Session-ID": test_session_id}
+        response = self.session.get(URL_SESSION_DATA, headers=headers)
+        
+        # We expect this to fail with 401 since we don't have a real session ID
+        # But we're testing that the endpoint exists and handles the request properly
+        if response.status_code == 401:
+            self.log_result("Google OAuth Integration", True, "Endpoint exists and properly validates session ID")
+        elif response.status_code == 400:
+            # Test without header
+            response2 = self.session.get(URL_SESSION_DATA)
+            if response2.status_code == 400:
+                self.log_result("Google OAuth Integration", True, "Endpoint properly requires X-Session-ID header")
             else:
-                self.log_result("Google OAuth Integration", False, f"Unexpected status: {response.status_code}")
-                
-        except Exception as e:
-            self.log_result("Google OAuth Integration", False, f"Exception: {str(e)}", True)
+                self.log_result("Google OAuth Integration", False, "Endpoint doesn't properly validate missing header")
+        else:
+            self.log_result("Google OAuth Integration", False, f"Unexpected status: {response.status_code}")
 
+    @api_test("Get Current User")
     def test_get_current_user(self):
         """Test get current user endpoint"""
         print("\n=== Testing Get Current User ===")
@@ -165,40 +290,34 @@ class BlossomAPITester:
             self.log_result("Get Current User", False, "No auth token available", True)
             return
             
-        try:
-            response = self.session.get(f"{BASE_URL}/auth/me")
-            
-            if response.status_code == 200:
-                user = response.json()
-                if "user_id" in user and "email" in user:
-                    self.log_result("Get Current User", True, "User data retrieved successfully")
-                else:
-                    self.log_result("Get Current User", False, "Missing required user fields")
+        response = self.session.get(URL_ME)
+        
+        if response.status_code == 200:
+            user = self.parse_json(response)
+            if self.has_fields(user, "user"):
+                self.log_result("Get Current User", True, "User data retrieved successfully")
             else:
-                self.log_result("Get Current User", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Get Current User", False, f"Exception: {str(e)}")
+                self.log_result("Get Current User", False, "Missing required user fields")
+        else:
+            self.log_result("Get Current User", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("User Logout")
     def test_logout(self):
         """Test user logout"""
         print("\n=== Testing User Logout ===")
         
-        try:
-            response = self.session.post(f"{BASE_URL}/auth/logout")
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "message" in result:
-                    self.log_result("User Logout", True, "Logout successful")
-                else:
-                    self.log_result("User Logout", False, "Missing message in response")
+        response = self.session.post(URL_LOGOUT)
+        
+        if response.status_code == 200:
+            result = self.parse_json(response)
+            if self.has_fields(result, "message"):
+                self.log_result("User Logout", True, "Logout successful")
             else:
-                self.log_result("User Logout", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("User Logout", False, f"Exception: {str(e)}")
+                self.log_result("User Logout", False, "Missing message in response")
+        else:
+            self.log_result("User Logout", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Post Creation with AI Moderation", critical=True)
     def test_create_post(self):
         """Test post creation with AI moderation"""
         print("\n=== Testing Post Creation with AI Moderation ===")
@@ -207,22 +326,20 @@ class BlossomAPITester:
             self.log_result("Post Creation", False, "No auth token available", True)
             return
             
-        try:
-            response = self.session.post(f"{BASE_URL}/posts", json=TEST_POST_DATA)
-            
-            if response.status_code == 200:
-                post = response.json()
-                if "post_id" in post and "moderation_status" in post:
-                    self.test_post_id = post["post_id"]
-                    self.log_result("Post Creation with AI Moderation", True, f"Post created with moderation status: {post['moderation_status']}")
-                else:
-                    self.log_result("Post Creation with AI Moderation", False, "Missing required post fields")
+        response = self.session.post(URL_POSTS, data=TEST_POST_JSON, headers=JSON_HEADERS)
+        
+        if response.status_code == 200:
+            post = self.parse_json(response)
+            if self.has_fields(post, "post"):
+                self.test_post_id = post["post_id"]
+                self.test_post_url = f"{URL_POSTS}/{self.test_post_id}"
+                self.log_result("Post Creation with AI Moderation", True, f"Post created with moderation status: {post['moderation_status']}")
             else:
-                self.log_result("Post Creation with AI Moderation", False, f"Status: {response.status_code}, Response: {response.text}", True)
-                
-        except Exception as e:
-            self.log_result("Post Creation with AI Moderation", False, f"Exception: {str(e)}", True)
+                self.log_result("Post Creation with AI Moderation", False, "Missing required post fields")
+        else:
+            self.log_result("Post Creation with AI Moderation", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}", True)
 
+    @api_test("Posts Feed API", critical=True)
     def test_get_posts_feed(self):
         """Test posts feed API"""
         print("\n=== Testing Posts Feed API ===")
@@ -231,30 +348,27 @@ class BlossomAPITester:
             self.log_result("Posts Feed API", False, "No auth token available", True)
             return
             
-        try:
-            # Test without category filter
-            response = self.session.get(f"{BASE_URL}/posts")
-            
-            if response.status_code == 200:
-                posts = response.json()
-                if isinstance(posts, list):
-                    self.log_result("Posts Feed API (All)", True, f"Retrieved {len(posts)} posts")
-                    
-                    # Test with category filter
-                    response2 = self.session.get(f"{BASE_URL}/posts?category=pregnancy")
-                    if response2.status_code == 200:
-                        pregnancy_posts = response2.json()
-                        self.log_result("Posts Feed API (Category Filter)", True, f"Retrieved {len(pregnancy_posts)} pregnancy posts")
-                    else:
-                        self.log_result("Posts Feed API (Category Filter)", False, f"Category filter failed: {response2.status_code}")
+        # Test without category filter
+        response = self.session.get(URL_POSTS)
+        
+        if response.status_code == 200:
+            posts = self.parse_json(response)
+            if isinstance(posts, list):
+                self.log_result("Posts Feed API (All)", True, f"Retrieved {len(posts)} posts")
+                
+                # Test with category filter
+                response2 = self.session.get(URL_POSTS_PREGNANCY)
+                if response2.status_code == 200:
+                    pregnancy_posts = self.parse_json(response2)
+                    self.log_result("Posts Feed API (Category Filter)", True, f"Retrieved {len(pregnancy_posts)} pregnancy posts")
                 else:
-                    self.log_result("Posts Feed API", False, "Response is not a list")
+                    self.log_result("Posts Feed API (Category Filter)", False, f"Category filter failed: {response2.status_code}")
             else:
-                self.log_result("Posts Feed API", False, f"Status: {response.status_code}, Response: {response.text}", True)
-                
-        except Exception as e:
-            self.log_result("Posts Feed API", False, f"Exception: {str(e)}", True)
+                self.log_result("Posts Feed API", False, "Response is not a list")
+        else:
+            self.log_result("Posts Feed API", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}", True)
 
+    @api_test("Get Single Post")
     def test_get_single_post(self):
         """Test get single post"""
         print("\n=== Testing Get Single Post ===")
@@ -267,21 +381,18 @@ class BlossomAPITester:
             self.log_result("Get Single Post", False, "No test post ID available")
             return
             
-        try:
-            response = self.session.get(f"{BASE_URL}/posts/{self.test_post_id}")
-            
-            if response.status_code == 200:
-                post = response.json()
-                if "post_id" in post and post["post_id"] == self.test_post_id:
-                    self.log_result("Get Single Post", True, "Post retrieved successfully")
-                else:
-                    self.log_result("Get Single Post", False, "Post ID mismatch")
+        response = self.session.get(self.test_post_url)
+        
+        if response.status_code == 200:
+            post = self.parse_json(response)
+            if "post_id" in post and post["post_id"] == self.test_post_id:
+                self.log_result("Get Single Post", True, "Post retrieved successfully")
             else:
-                self.log_result("Get Single Post", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Get Single Post", False, f"Exception: {str(e)}")
+                self.log_result("Get Single Post", False, "Post ID mismatch")
+        else:
+            self.log_result("Get Single Post", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Likes System")
     def test_like_post(self):
         """Test post like/unlike functionality"""
         print("\n=== Testing Likes System ===")
@@ -294,34 +405,31 @@ class BlossomAPITester:
             self.log_result("Likes System", False, "No test post ID available")
             return
             
-        try:
-            # Like the post
-            response = self.session.post(f"{BASE_URL}/posts/{self.test_post_id}/like")
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "liked" in result:
-                    liked_status = result["liked"]
-                    self.log_result("Likes System (Like)", True, f"Post liked: {liked_status}")
-                    
-                    # Unlike the post
-                    response2 = self.session.post(f"{BASE_URL}/posts/{self.test_post_id}/like")
-                    if response2.status_code == 200:
-                        result2 = response2.json()
-                        if "liked" in result2 and result2["liked"] != liked_status:
-                            self.log_result("Likes System (Unlike)", True, f"Post unliked: {result2['liked']}")
-                        else:
-                            self.log_result("Likes System (Unlike)", False, "Like toggle not working properly")
+        # Like the post
+        response = self.session.post(f"{self.test_post_url}/like")
+        
+        if response.status_code == 200:
+            result = self.parse_json(response)
+            if self.has_fields(result, "like"):
+                liked_status = result["liked"]
+                self.log_result("Likes System (Like)", True, f"Post liked: {liked_status}")
+                
+                # Unlike the post
+                response2 = self.session.post(f"{self.test_post_url}/like")
+                if response2.status_code == 200:
+                    result2 = self.parse_json(response2)
+                    if self.has_fields(result2, "like") and result2["liked"] != liked_status:
+                        self.log_result("Likes System (Unlike)", True, f"Post unliked: {result2['liked']}")
                     else:
-                        self.log_result("Likes System (Unlike)", False, f"Unlike failed: {response2.status_code}")
+                        self.log_result("Likes System (Unlike)", False, "Like toggle not working properly")
                 else:
-                    self.log_result("Likes System", False, "Missing 'liked' field in response")
+                    self.log_result("Likes System (Unlike)", False, f"Unlike failed: {response2.status_code}")
             else:
-                self.log_result("Likes System", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Likes System", False, f"Exception: {str(e)}")
+                self.log_result("Likes System", False, "Missing 'liked' field in response")
+        else:
+            self.log_result("Likes System", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Comments System")
     def test_comments_system(self):
         """Test comments creation and retrieval"""
         print("\n=== Testing Comments System ===")
@@ -334,34 +442,31 @@ class BlossomAPITester:
             self.log_result("Comments System", False, "No test post ID available")
             return
             
-        try:
-            # Create comment
-            comment_data = {**TEST_COMMENT_DATA, "post_id": self.test_post_id}
-            response = self.session.post(f"{BASE_URL}/comments", json=comment_data)
-            
-            if response.status_code == 200:
-                comment = response.json()
-                if "comment_id" in comment and "post_id" in comment:
-                    self.log_result("Comments System (Create)", True, "Comment created successfully")
-                    
-                    # Get comments for post
-                    response2 = self.session.get(f"{BASE_URL}/posts/{self.test_post_id}/comments")
-                    if response2.status_code == 200:
-                        comments = response2.json()
-                        if isinstance(comments, list) and len(comments) > 0:
-                            self.log_result("Comments System (Retrieve)", True, f"Retrieved {len(comments)} comments")
-                        else:
-                            self.log_result("Comments System (Retrieve)", False, "No comments retrieved")
+        # Create comment
+        comment_json = TEST_COMMENT_PREFIX + self.test_post_id.encode() + b'"}'
+        response = self.session.post(URL_COMMENTS, data=comment_json, headers=JSON_HEADERS)
+        
+        if response.status_code == 200:
+            comment = self.parse_json(response)
+            if self.has_fields(comment, "comment"):
+                self.log_result("Comments System (Create)", True, "Comment created successfully")
+                
+                # Get comments for post
+                response2 = self.session.get(f"{self.test_post_url}/comments")
+                if response2.status_code == 200:
+                    comments = self.parse_json(response2)
+                    if isinstance(comments, list) and len(comments) > 0:
+                        self.log_result("Comments System (Retrieve)", True, f"Retrieved {len(comments)} comments")
                     else:
-                        self.log_result("Comments System (Retrieve)", False, f"Get comments failed: {response2.status_code}")
+                        self.log_result("Comments System (Retrieve)", False, "No comments retrieved")
                 else:
-                    self.log_result("Comments System (Create)", False, "Missing required comment fields")
+                    self.log_result("Comments System (Retrieve)", False, f"Get comments failed: {response2.status_code}")
             else:
-                self.log_result("Comments System", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Comments System", False, f"Exception: {str(e)}")
+                self.log_result("Comments System (Create)", False, "Missing required comment fields")
+        else:
+            self.log_result("Comments System", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Forums API")
     def test_forums_api(self):
         """Test forums API"""
         print("\n=== Testing Forums API ===")
@@ -370,37 +475,34 @@ class BlossomAPITester:
             self.log_result("Forums API", False, "No auth token available")
             return
             
-        try:
-            # Get all forums
-            response = self.session.get(f"{BASE_URL}/forums")
-            
-            if response.status_code == 200:
-                forums = response.json()
-                if isinstance(forums, list):
-                    self.log_result("Forums API (List)", True, f"Retrieved {len(forums)} forums")
-                    
-                    # Test get single forum if forums exist
-                    if len(forums) > 0:
-                        forum_id = forums[0]["forum_id"]
-                        response2 = self.session.get(f"{BASE_URL}/forums/{forum_id}")
-                        if response2.status_code == 200:
-                            forum = response2.json()
-                            if "forum_id" in forum:
-                                self.log_result("Forums API (Single)", True, "Forum details retrieved successfully")
-                            else:
-                                self.log_result("Forums API (Single)", False, "Missing forum_id in response")
+        # Get all forums
+        response = self.session.get(URL_FORUMS)
+        
+        if response.status_code == 200:
+            forums = self.parse_json(response)
+            if isinstance(forums, list):
+                self.log_result("Forums API (List)", True, f"Retrieved {len(forums)} forums")
+                
+                # Test get single forum if forums exist
+                if len(forums) > 0:
+                    forum_id = forums[0]["forum_id"]
+                    response2 = self.session.get(f"{URL_FORUMS}/{forum_id}")
+                    if response2.status_code == 200:
+                        forum = self.parse_json(response2)
+                        if self.has_fields(forum, "forum"):
+                            self.log_result("Forums API (Single)", True, "Forum details retrieved successfully")
                         else:
-                            self.log_result("Forums API (Single)", False, f"Get single forum failed: {response2.status_code}")
+                            self.log_result("Forums API (Single)", False, "Missing forum_id in response")
                     else:
-                        self.log_result("Forums API (Single)", False, "No forums available to test single forum endpoint")
+                        self.log_result("Forums API (Single)", False, f"Get single forum failed: {response2.status_code}")
                 else:
-                    self.log_result("Forums API", False, "Response is not a list")
+                    self.log_result("Forums API (Single)", False, "No forums available to test single forum endpoint")
             else:
-                self.log_result("Forums API", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Forums API", False, f"Exception: {str(e)}")
+                self.log_result("Forums API", False, "Response is not a list")
+        else:
+            self.log_result("Forums API", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Support Groups API")
     def test_support_groups_api(self):
         """Test support groups API"""
         print("\n=== Testing Support Groups API ===")
@@ -409,37 +511,34 @@ class BlossomAPITester:
             self.log_result("Support Groups API", False, "No auth token available")
             return
             
-        try:
-            # Get all support groups
-            response = self.session.get(f"{BASE_URL}/support-groups")
-            
-            if response.status_code == 200:
-                groups = response.json()
-                if isinstance(groups, list):
-                    self.log_result("Support Groups API (List)", True, f"Retrieved {len(groups)} support groups")
-                    
-                    # Test join support group if groups exist
-                    if len(groups) > 0:
-                        group_id = groups[0]["group_id"]
-                        response2 = self.session.post(f"{BASE_URL}/support-groups/{group_id}/join")
-                        if response2.status_code == 200:
-                            result = response2.json()
-                            if "message" in result:
-                                self.log_result("Support Groups API (Join)", True, "Successfully joined support group")
-                            else:
-                                self.log_result("Support Groups API (Join)", False, "Missing message in join response")
+        # Get all support groups
+        response = self.session.get(URL_SUPPORT_GROUPS)
+        
+        if response.status_code == 200:
+            groups = self.parse_json(response)
+            if isinstance(groups, list):
+                self.log_result("Support Groups API (List)", True, f"Retrieved {len(groups)} support groups")
+                
+                # Test join support group if groups exist
+                if len(groups) > 0:
+                    group_id = groups[0]["group_id"]
+                    response2 = self.session.post(f"{URL_SUPPORT_GROUPS}/{group_id}/join")
+                    if response2.status_code == 200:
+                        result = self.parse_json(response2)
+                        if self.has_fields(result, "message"):
+                            self.log_result("Support Groups API (Join)", True, "Successfully joined support group")
                         else:
-                            self.log_result("Support Groups API (Join)", False, f"Join group failed: {response2.status_code}")
+                            self.log_result("Support Groups API (Join)", False, "Missing message in join response")
                     else:
-                        self.log_result("Support Groups API (Join)", False, "No groups available to test join endpoint")
+                        self.log_result("Support Groups API (Join)", False, f"Join group failed: {response2.status_code}")
                 else:
-                    self.log_result("Support Groups API", False, "Response is not a list")
+                    self.log_result("Support Groups API (Join)", False, "No groups available to test join endpoint")
             else:
-                self.log_result("Support Groups API", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Support Groups API", False, f"Exception: {str(e)}")
+                self.log_result("Support Groups API", False, "Response is not a list")
+        else:
+            self.log_result("Support Groups API", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Milestones Tracking")
     def test_milestones_tracking(self):
         """Test milestones tracking"""
         print("\n=== Testing Milestones Tracking ===")
@@ -448,46 +547,43 @@ class BlossomAPITester:
             self.log_result("Milestones Tracking", False, "No auth token available")
             return
             
-        try:
-            # Create milestone
-            response = self.session.post(f"{BASE_URL}/milestones", json=TEST_MILESTONE_DATA)
-            
-            if response.status_code == 200:
-                milestone = response.json()
-                if "milestone_id" in milestone:
-                    self.test_milestone_id = milestone["milestone_id"]
-                    self.log_result("Milestones Tracking (Create)", True, "Milestone created successfully")
-                    
-                    # Get user milestones
-                    response2 = self.session.get(f"{BASE_URL}/milestones")
-                    if response2.status_code == 200:
-                        milestones = response2.json()
-                        if isinstance(milestones, list):
-                            self.log_result("Milestones Tracking (List)", True, f"Retrieved {len(milestones)} milestones")
-                            
-                            # Complete milestone
-                            if self.test_milestone_id:
-                                response3 = self.session.put(f"{BASE_URL}/milestones/{self.test_milestone_id}/complete")
-                                if response3.status_code == 200:
-                                    completed_milestone = response3.json()
-                                    if completed_milestone.get("completed"):
-                                        self.log_result("Milestones Tracking (Complete)", True, "Milestone completed successfully")
-                                    else:
-                                        self.log_result("Milestones Tracking (Complete)", False, "Milestone not marked as completed")
+        # Create milestone
+        response = self.session.post(URL_MILESTONES, data=TEST_MILESTONE_JSON, headers=JSON_HEADERS)
+        
+        if response.status_code == 200:
+            milestone = self.parse_json(response)
+            if self.has_fields(milestone, "milestone"):
+                self.test_milestone_id = milestone["milestone_id"]
+                self.log_result("Milestones Tracking (Create)", True, "Milestone created successfully")
+                
+                # Get user milestones
+                response2 = self.session.get(URL_MILESTONES)
+                if response2.status_code == 200:
+                    milestones = self.parse_json(response2)
+                    if isinstance(milestones, list):
+                        self.log_result("Milestones Tracking (List)", True, f"Retrieved {len(milestones)} milestones")
+                        
+                        # Complete milestone
+                        if self.test_milestone_id:
+                            response3 = self.session.put(f"{URL_MILESTONES}/{self.test_milestone_id}/complete")
+                            if response3.status_code == 200:
+                                completed_milestone = self.parse_json(response3)
+                                if completed_milestone.get("completed"):
+                                    self.log_result("Milestones Tracking (Complete)", True, "Milestone completed successfully")
                                 else:
-                                    self.log_result("Milestones Tracking (Complete)", False, f"Complete milestone failed: {response3.status_code}")
-                        else:
-                            self.log_result("Milestones Tracking (List)", False, "Response is not a list")
+                                    self.log_result("Milestones Tracking (Complete)", False, "Milestone not marked as completed")
+                            else:
+                                self.log_result("Milestones Tracking (Complete)", False, f"Complete milestone failed: {response3.status_code}")
                     else:
-                        self.log_result("Milestones Tracking (List)", False, f"Get milestones failed: {response2.status_code}")
+                        self.log_result("Milestones Tracking (List)", False, "Response is not a list")
                 else:
-                    self.log_result("Milestones Tracking (Create)", False, "Missing milestone_id in response")
+                    self.log_result("Milestones Tracking (List)", False, f"Get milestones failed: {response2.status_code}")
             else:
-                self.log_result("Milestones Tracking", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Milestones Tracking", False, f"Exception: {str(e)}")
+                self.log_result("Milestones Tracking (Create)", False, "Missing milestone_id in response")
+        else:
+            self.log_result("Milestones Tracking", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Resources Library")
     def test_resources_library(self):
         """Test resources library"""
         print("\n=== Testing Resources Library ===")
@@ -496,40 +592,37 @@ class BlossomAPITester:
             self.log_result("Resources Library", False, "No auth token available")
             return
             
-        try:
-            # Get all resources
-            response = self.session.get(f"{BASE_URL}/resources")
-            
-            if response.status_code == 200:
-                resources = response.json()
-                if isinstance(resources, list):
-                    self.log_result("Resources Library (All)", True, f"Retrieved {len(resources)} resources")
-                    
-                    # Test with category filter
-                    response2 = self.session.get(f"{BASE_URL}/resources?category=pregnancy")
-                    if response2.status_code == 200:
-                        pregnancy_resources = response2.json()
-                        if isinstance(pregnancy_resources, list):
-                            self.log_result("Resources Library (Category Filter)", True, f"Retrieved {len(pregnancy_resources)} pregnancy resources")
-                            
-                            # Check premium filtering (non-premium user should only see non-premium resources)
-                            premium_resources = [r for r in pregnancy_resources if r.get("is_premium", False)]
-                            if len(premium_resources) == 0:
-                                self.log_result("Resources Library (Premium Filter)", True, "Premium filtering working correctly")
-                            else:
-                                self.log_result("Resources Library (Premium Filter)", False, f"Found {len(premium_resources)} premium resources for non-premium user")
+        # Get all resources
+        response = self.session.get(URL_RESOURCES)
+        
+        if response.status_code == 200:
+            resources = self.parse_json(response)
+            if isinstance(resources, list):
+                self.log_result("Resources Library (All)", True, f"Retrieved {len(resources)} resources")
+                
+                # Test with category filter
+                response2 = self.session.get(URL_RESOURCES_PREGNANCY)
+                if response2.status_code == 200:
+                    pregnancy_resources = self.parse_json(response2)
+                    if isinstance(pregnancy_resources, list):
+                        self.log_result("Resources Library (Category Filter)", True, f"Retrieved {len(pregnancy_resources)} pregnancy resources")
+                        
+                        # Check premium filtering (non-premium user should only see non-premium resources)
+                        premium_resources = [r for r in pregnancy_resources if r.get("is_premium", False)]
+                        if len(premium_resources) == 0:
+                            self.log_result("Resources Library (Premium Filter)", True, "Premium filtering working correctly")
                         else:
-                            self.log_result("Resources Library (Category Filter)", False, "Category filter response is not a list")
+                            self.log_result("Resources Library (Premium Filter)", False, f"Found {len(premium_resources)} premium resources for non-premium user")
                     else:
-                        self.log_result("Resources Library (Category Filter)", False, f"Category filter failed: {response2.status_code}")
+                        self.log_result("Resources Library (Category Filter)", False, "Category filter response is not a list")
                 else:
-                    self.log_result("Resources Library", False, "Response is not a list")
+                    self.log_result("Resources Library (Category Filter)", False, f"Category filter failed: {response2.status_code}")
             else:
-                self.log_result("Resources Library", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Resources Library", False, f"Exception: {str(e)}")
+                self.log_result("Resources Library", False, "Response is not a list")
+        else:
+            self.log_result("Resources Library", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Premium Membership")
     def test_premium_membership(self):
         """Test premium membership"""
         print("\n=== Testing Premium Membership ===")
@@ -538,45 +631,42 @@ class BlossomAPITester:
             self.log_result("Premium Membership", False, "No auth token available")
             return
             
-        try:
-            # Get premium status (should be false initially)
-            response = self.session.get(f"{BASE_URL}/premium/status")
-            
-            if response.status_code == 200:
-                status = response.json()
-                if "is_premium" in status:
-                    initial_premium = status["is_premium"]
-                    self.log_result("Premium Membership (Status)", True, f"Premium status retrieved: {initial_premium}")
-                    
-                    # Subscribe to premium
-                    response2 = self.session.post(f"{BASE_URL}/premium/subscribe")
-                    if response2.status_code == 200:
-                        result = response2.json()
-                        if "is_premium" in result and result["is_premium"]:
-                            self.log_result("Premium Membership (Subscribe)", True, "Premium subscription successful")
-                            
-                            # Verify status changed
-                            response3 = self.session.get(f"{BASE_URL}/premium/status")
-                            if response3.status_code == 200:
-                                new_status = response3.json()
-                                if new_status.get("is_premium"):
-                                    self.log_result("Premium Membership (Status Update)", True, "Premium status updated correctly")
-                                else:
-                                    self.log_result("Premium Membership (Status Update)", False, "Premium status not updated")
+        # Get premium status (should be false initially)
+        response = self.session.get(URL_PREMIUM_STATUS)
+        
+        if response.status_code == 200:
+            status = self.parse_json(response)
+            if self.has_fields(status, "premium"):
+                initial_premium = status["is_premium"]
+                self.log_result("Premium Membership (Status)", True, f"Premium status retrieved: {initial_premium}")
+                
+                # Subscribe to premium
+                response2 = self.session.post(URL_PREMIUM_SUBSCRIBE)
+                if response2.status_code == 200:
+                    result = self.parse_json(response2)
+                    if self.has_fields(result, "premium") and result["is_premium"]:
+                        self.log_result("Premium Membership (Subscribe)", True, "Premium subscription successful")
+                        
+                        # Verify status changed
+                        response3 = self.session.get(URL_PREMIUM_STATUS)
+                        if response3.status_code == 200:
+                            new_status = self.parse_json(response3)
+                            if new_status.get("is_premium"):
+                                self.log_result("Premium Membership (Status Update)", True, "Premium status updated correctly")
                             else:
-                                self.log_result("Premium Membership (Status Update)", False, f"Status check failed: {response3.status_code}")
+                                self.log_result("Premium Membership (Status Update)", False, "Premium status not updated")
                         else:
-                            self.log_result("Premium Membership (Subscribe)", False, "Premium subscription response invalid")
+                            self.log_result("Premium Membership (Status Update)", False, f"Status check failed: {response3.status_code}")
                     else:
-                        self.log_result("Premium Membership (Subscribe)", False, f"Subscribe failed: {response2.status_code}")
+                        self.log_result("Premium Membership (Subscribe)", False, "Premium subscription response invalid")
                 else:
-                    self.log_result("Premium Membership (Status)", False, "Missing is_premium in response")
+                    self.log_result("Premium Membership (Subscribe)", False, f"Subscribe failed: {response2.status_code}")
             else:
-                self.log_result("Premium Membership", False, f"Status: {response.status_code}, Response: {response.text}")
-                
-        except Exception as e:
-            self.log_result("Premium Membership", False, f"Exception: {str(e)}")
+                self.log_result("Premium Membership (Status)", False, "Missing is_premium in response")
+        else:
+            self.log_result("Premium Membership", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
 
+    @api_test("Push Notification Token Registration")
     def test_push_notifications(self):
         """Test push notification token registration"""
         print("\n=== Testing Push Notification Token Registration ===")
@@ -585,40 +675,113 @@ class BlossomAPITester:
             self.log_result("Push Notification Token Registration", False, "No auth token available")
             return
             
-        try:
-            # Register push token
-            response = self.session.post(f"{BASE_URL}/notifications/register-token", json=TEST_PUSH_TOKEN_DATA)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "message" in result:
-                    self.log_result("Push Notification Token Registration", True, "Push token registered successfully")
-                    
-                    # Test notification preferences
-                    response2 = self.session.get(f"{BASE_URL}/notifications/preferences")
-                    if response2.status_code == 200:
-                        prefs = response2.json()
-                        if "user_id" in prefs:
-                            self.log_result("Notification Preferences (Get)", True, "Preferences retrieved successfully")
-                            
-                            # Update preferences
-                            update_data = {"new_posts": False, "milestone_reminders": True}
-                            response3 = self.session.put(f"{BASE_URL}/notifications/preferences", json=update_data)
-                            if response3.status_code == 200:
-                                self.log_result("Notification Preferences (Update)", True, "Preferences updated successfully")
-                            else:
-                                self.log_result("Notification Preferences (Update)", False, f"Update failed: {response3.status_code}")
+        # Register push token
+        response = self.session.post(URL_REGISTER_PUSH_TOKEN, data=TEST_PUSH_TOKEN_JSON, headers=JSON_HEADERS)
+        
+        if response.status_code == 200:
+            result = self.parse_json(response)
+            if self.has_fields(result, "message"):
+                self.log_result("Push Notification Token Registration", True, "Push token registered successfully")
+                
+                # Test notification preferences
+                response2 = self.session.get(URL_NOTIFICATION_PREFERENCES)
+                if response2.status_code == 200:
+                    prefs = self.parse_json(response2)
+                    if self.has_fields(prefs, "preferences"):
+                        self.log_result("Notification Preferences (Get)", True, "Preferences retrieved successfully")
+                        
+                        # Update preferences
+                        response3 = self.session.put(URL_NOTIFICATION_PREFERENCES, data=TEST_PREFERENCES_JSON, headers=JSON_HEADERS)
+                        if response3.status_code == 200:
+                            self.log_result("Notification Preferences (Update)", True, "Preferences updated successfully")
                         else:
-                            self.log_result("Notification Preferences (Get)", False, "Missing user_id in preferences")
+                            self.log_result("Notification Preferences (Update)", False, f"Update failed: {response3.status_code}")
                     else:
-                        self.log_result("Notification Preferences (Get)", False, f"Get preferences failed: {response2.status_code}")
+                        self.log_result("Notification Preferences (Get)", False, "Missing user_id in preferences")
                 else:
-                    self.log_result("Push Notification Token Registration", False, "Missing message in response")
+                    self.log_result("Notification Preferences (Get)", False, f"Get preferences failed: {response2.status_code}")
             else:
-                self.log_result("Push Notification Token Registration", False, f"Status: {response.status_code}, Response: {response.text}")
-                
+                self.log_result("Push Notification Token Registration", False, "Missing message in response")
+        else:
+            self.log_result("Push Notification Token Registration", False, f"Status: {response.status_code}, Response: {self.body_snippet(response)}")
+
+    def load_cached_session(self):
+        """Reuse a cached login token if it is still accepted by the API"""
+        if not USE_SESSION_CACHE:
+            return False
+        
+        try:
+            cached = orjson.loads(SESSION_CACHE_PATH.read_bytes())
+            if cached["exp"] <= time.time():
+                return False
+            
+            self.session.headers["Authorization"] = f"Bearer {cached['token']}".encode("latin-1")
+            response = self.session.get(URL_ME)
+            if response.status_code != 200:
+                del self.session.headers["Authorization"]
+                return False
+            
+            self.auth_token = cached["token"]
+            self.test_user_id = self.parse_json(response)["user_id"]
+            print("✅ Reused cached login token")
+            return True
+        except Exception:
+            self.session.headers.pop("Authorization", None)
+            return False
+
+    def save_cached_session(self):
+        """Write the login token to the session cache"""
+        if not USE_SESSION_CACHE:
+            return
+        
+        try:
+            SESSION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = SESSION_CACHE_PATH.with_suffix(".tmp")
+            tmp_path.write_bytes(orjson.dumps({
+                "token": self.auth_token,
+                "exp": time.time() + SESSION_CACHE_TTL_SECONDS
+            }))
+            os.replace(tmp_path, SESSION_CACHE_PATH)
         except Exception as e:
-            self.log_result("Push Notification Token Registration", False, f"Exception: {str(e)}")
+            print(f"⚠️ Could not cache login token: {e}")
+
+    def run_parallel(self, *tests):
+        """Run independent tests concurrently on worker threads"""
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TESTS) as pool:
+            for future in [pool.submit(test) for test in tests]:
+                future.result()
+
+    def timed_get(self, url):
+        """GET a URL and return the elapsed time in nanoseconds; errors raise"""
+        start = time.perf_counter_ns()
+        response = self.session.get(url)
+        elapsed = time.perf_counter_ns() - start
+        # Fast error responses (e.g. a 401) would skew the latency figures
+        response.raise_for_status()
+        return elapsed
+
+    def sample_latencies(self):
+        """Sample each idempotent endpoint several times concurrently"""
+        print("\n=== Sampling Endpoint Latency ===")
+        
+        if not self.auth_token:
+            print("⚠️ Skipping latency sampling: no auth token available")
+            return
+            
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TESTS) as pool:
+            samples = {
+                name: [pool.submit(self.timed_get, url) for _ in range(LATENCY_SAMPLES)]
+                for name, url in LATENCY_ENDPOINTS
+            }
+            for name, futures in samples.items():
+                timings = array.array("q")
+                for future in futures:
+                    try:
+                        timings.append(future.result())
+                    except Exception as e:
+                        print(f"⚠️ {name} latency sample failed: {e}")
+                if timings:
+                    self.latencies[name] = timings
 
     def run_all_tests(self):
         """Run all backend tests in priority order"""
@@ -626,23 +789,33 @@ class BlossomAPITester:
         print(f"Base URL: {BASE_URL}")
         print(f"Test User: {TEST_USER_EMAIL}")
         
-        # Seed data first
-        try:
-            seed_response = self.session.post(f"{BASE_URL}/seed-data")
-            if seed_response.status_code == 200:
-                print("✅ Data seeded successfully")
-            else:
-                print(f"⚠️ Seed data warning: {seed_response.status_code}")
-        except Exception as e:
-            print(f"⚠️ Seed data error: {e}")
+        # Seed data first; seeding is an upsert, so it is safe to retry by hand
+        # even though the adapter never retries POSTs
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            try:
+                seed_response = self.session.post(URL_SEED_DATA)
+                if seed_response.status_code == 200:
+                    print("✅ Data seeded successfully")
+                    break
+                if seed_response.status_code not in RETRY_STATUSES or attempt == RETRY_ATTEMPTS:
+                    print(f"⚠️ Seed data warning: {seed_response.status_code}")
+                    break
+            except requests.ConnectionError as e:
+                if attempt == RETRY_ATTEMPTS:
+                    print(f"⚠️ Seed data error: {e}")
+                    break
+            except Exception as e:
+                print(f"⚠️ Seed data error: {e}")
+                break
+            print(f"↻ Retrying seed data (attempt {attempt + 2})")
+            time.sleep(RETRY_BACKOFF_FACTOR * 2 ** attempt)
         
         # HIGH PRIORITY TESTS
-        print("\n" + "="*50)
-        print("HIGH PRIORITY TESTS")
-        print("="*50)
+        sys.stdout.write(TIER_BANNER.format(tier="HIGH"))
         
         self.test_user_registration()
-        self.test_user_login()
+        if not self.load_cached_session():
+            self.test_user_login()
         self.test_google_oauth_session()
         self.test_get_current_user()
         self.test_create_post()
@@ -650,22 +823,23 @@ class BlossomAPITester:
         self.test_get_single_post()
         
         # MEDIUM PRIORITY TESTS
-        print("\n" + "="*50)
-        print("MEDIUM PRIORITY TESTS")
-        print("="*50)
-        
-        self.test_like_post()
-        self.test_comments_system()
-        self.test_forums_api()
-        self.test_support_groups_api()
-        self.test_milestones_tracking()
-        self.test_resources_library()
-        self.test_push_notifications()
+        sys.stdout.write(TIER_BANNER.format(tier="MEDIUM"))
+        
+        # These don't depend on each other, so overlap their round trips
+        self.run_parallel(
+            self.test_like_post,
+            self.test_comments_system,
+            self.test_forums_api,
+            self.test_support_groups_api,
+            self.test_milestones_tracking,
+            self.test_resources_library,
+            self.test_push_notifications
+        )
+        
+        self.sample_latencies()
         
         # LOW PRIORITY TESTS
-        print("\n" + "="*50)
-        print("LOW PRIORITY TESTS")
-        print("="*50)
+        sys.stdout.write(TIER_BANNER.format(tier="LOW"))
         
         self.test_premium_membership()
         self.test_logout()
@@ -675,32 +849,55 @@ class BlossomAPITester:
 
     def print_summary(self):
         """Print test results summary"""
-        print("\n" + "="*60)
-        print("TEST RESULTS SUMMARY")
-        print("="*60)
+        # Build the whole report and write it once
+        lines = ["", "="*60, "TEST RESULTS SUMMARY", "="*60]
         
-        total_tests = len(self.results["passed"]) + len(self.results["failed"])
-        passed_count = len(self.results["passed"])
-        failed_count = len(self.results["failed"])
-        critical_count = len(self.results["critical_failures"])
+        passed_count = self.passed_count
+        failed_count = self.failed_count
+        total_tests = passed_count + failed_count
+        critical_count = len(self.critical_failures)
         
-        print(f"Total Tests: {total_tests}")
-        print(f"✅ Passed: {passed_count}")
-        print(f"❌ Failed: {failed_count}")
-        print(f"🚨 Critical Failures: {critical_count}")
+        lines.append(f"Total Tests: {total_tests}")
+        lines.append(f"✅ Passed: {passed_count}")
+        lines.append(f"❌ Failed: {failed_count}")
+        lines.append(f"🚨 Critical Failures: {critical_count}")
         
         if failed_count > 0:
-            print("\n--- FAILED TESTS ---")
-            for failure in self.results["failed"]:
-                print(f"❌ {failure['test']}: {failure['details']}")
+            lines.append("")
+            lines.append("--- FAILED TESTS ---")
+            for idx, details in self.details.items():
+                lines.append(f"❌ {self.test_names[idx]}: {details}")
         
         if critical_count > 0:
-            print("\n--- CRITICAL FAILURES ---")
-            for critical in self.results["critical_failures"]:
-                print(f"🚨 {critical['test']}: {critical['details']}")
-        
-        print(f"\nSuccess Rate: {(passed_count/total_tests)*100:.1f}%")
+            lines.append("")
+            lines.append("--- CRITICAL FAILURES ---")
+            for idx in self.critical_failures:
+                lines.append(f"🚨 {self.test_names[idx]}: {self.details[idx]}")
+        
+        if self.timings:
+            lines.append("")
+            lines.append("--- SLOWEST TESTS ---")
+            for name, elapsed in sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:5]:
+                lines.append(f"🐢 {name}: {elapsed / 1e6:.1f} ms")
+        
+        if self.latencies:
+            lines.append("")
+            lines.append("--- LATENCY (ms: min / median / max) ---")
+            for name, timings in self.latencies.items():
+                lines.append(f"⏱️ {name}: {min(timings) / 1e6:.1f} / {statistics.median(timings) / 1e6:.1f} / {max(timings) / 1e6:.1f}")
+        
+        lines.append("")
+        lines.append(f"Success Rate: {(passed_count/total_tests)*100:.1f}%")
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
 
 if __name__ == "__main__":
-    tester = BlossomAPITester()
-    tester.run_all_tests()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Blossom backend API tests")
+    parser.add_argument("--fail-fast", action="store_true", help="stop at the first failed check")
+    args = parser.parse_args()
+    
+    tester = BlossomAPITester(fail_fast=args.fail_fast)
+    try:
+        tester.run_all_tests()
+    finally:
+        tester.session.close()
\ No newline at end of file